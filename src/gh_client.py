@@ -0,0 +1,307 @@
+# src/gh_client.py
+import os
+import re
+import time
+import random
+import asyncio
+import itertools
+import logging
+import threading
+import httpx
+
+
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+# Optional comma-separated pool; each token has its own rate-limit budget.
+# The first token is the primary identity: /user, repo creation, every write and
+# every conditional GET (ETags vary by Authorization) use it. The others only
+# take reads that opt in with rotate=True and don't depend on who owns the token.
+GITHUB_TOKENS = [t.strip() for t in os.getenv("GITHUB_TOKENS", "").split(",") if t.strip()] or [GITHUB_TOKEN]
+
+log = logging.getLogger(__name__)
+
+RATE_LIMIT_THRESHOLD = 50  # a token with fewer remaining requests is rested until its reset
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # seconds
+MAX_CONCURRENCY = 10  # stay well under GitHub's secondary (abuse) limits
+POOL_SIZE = 32  # keep-alive connections per token; covers parallel writes plus polling
+CONNECT_RETRIES = 3  # transport-level retries for failed connects
+SERVER_RETRIES = 3  # retries for transient 502/503/504 on read-only requests
+SERVER_BACKOFF = 0.3  # seconds, doubled per retry
+RETRY_STATUSES = {502, 503, 504}
+RETRYABLE_METHODS = {"GET", "HEAD"}  # a Contents PUT that landed would 409 on replay
+CACHE_TTL = 5.0  # seconds to reuse repo metadata / Pages responses
+
+_CACHEABLE_PATH = re.compile(r"^/repos/[^/]+/[^/]+(?:/pages)?$")
+
+
+class GhError(Exception):
+    """Base class for GitHub API errors; carries the failing response."""
+
+    def __init__(self, response: httpx.Response):
+        self.response = response
+        self.status = response.status_code
+        super().__init__(f"{response.status_code} {response.request.method} {response.request.url}: {response.text[:500]}")
+
+
+class GhRateLimited(GhError):
+    """Primary or secondary rate limit still hit after all retries."""
+
+
+class GhNotFound(GhError):
+    """404 from the API."""
+
+
+class GhServerError(GhError):
+    """5xx from the API."""
+
+
+def _is_rate_limited(response: httpx.Response) -> bool:
+    if response.status_code == 429:
+        return True
+    return response.status_code == 403 and (
+        "Retry-After" in response.headers or response.headers.get("X-RateLimit-Remaining") == "0"
+    )
+
+
+def raise_for_status(response: httpx.Response):
+    """Raise the typed GhError subclass matching a failed response."""
+    if response.is_success:
+        return response
+    if _is_rate_limited(response):
+        raise GhRateLimited(response)
+    if response.status_code == 404:
+        raise GhNotFound(response)
+    if response.status_code >= 500:
+        raise GhServerError(response)
+    raise GhError(response)
+
+
+class GhClient:
+    """
+    Thin async wrapper around pooled httpx.AsyncClients, one per bearer token.
+    Connections are kept alive and multiplexed over HTTP/2, so repeated GitHub
+    calls only pay the TLS/TCP handshake once. With several tokens, requests are
+    spread round-robin (for rotate=True reads only) and tokens close to their
+    rate limit are skipped.
+    """
+
+    def __init__(self, tokens=None, base_url: str = GITHUB_API_URL):
+        if isinstance(tokens, str):
+            tokens = [tokens]
+        self.tokens = list(tokens or GITHUB_TOKENS)
+        self.base_url = base_url
+        self._clients = {}  # {token: httpx.AsyncClient}
+        self._token_cycle = itertools.cycle(self.tokens)
+        self._rate = {}  # {token: (remaining, reset_epoch)} from the latest response
+        self._sem = asyncio.Semaphore(MAX_CONCURRENCY)
+        self._inflight = {}  # {request key: Future} for GETs currently on the wire
+        self._cache = {}  # {request key: (expires_at, response)}
+
+    def _http(self, token: str) -> httpx.AsyncClient:
+        # Created lazily so the pool is bound to the loop that first uses it
+        if token not in self._clients:
+            self._clients[token] = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=httpx.AsyncHTTPTransport(
+                    http2=True,
+                    retries=CONNECT_RETRIES,
+                    limits=httpx.Limits(max_keepalive_connections=POOL_SIZE, max_connections=100)
+                ),
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Accept": "application/vnd.github.v3+json"
+                },
+                timeout=30.0
+            )
+        return self._clients[token]
+
+    async def _next_token(self) -> str:
+        """Pick the next token with budget left; if all are drained, wait for the first reset."""
+        now = time.time()
+        for _ in range(len(self.tokens)):
+            token = next(self._token_cycle)
+            remaining, reset = self._rate.get(token, (None, 0))
+            if remaining is None or remaining >= RATE_LIMIT_THRESHOLD or reset <= now:
+                return token
+        token, (remaining, reset) = min(self._rate.items(), key=lambda item: item[1][1])
+        wait = max(0, reset - now)
+        log.warning("⏳ Only %s GitHub requests left on every token, pausing %.0fs until reset", remaining, wait)
+        await asyncio.sleep(wait)
+        return token
+
+    async def _primary_token(self) -> str:
+        """Return the primary token, first resting it until its reset if it is nearly drained."""
+        token = self.tokens[0]
+        remaining, reset = self._rate.get(token, (None, 0))
+        wait = reset - time.time()
+        if remaining is not None and remaining < RATE_LIMIT_THRESHOLD and wait > 0:
+            log.warning("⏳ Only %s GitHub requests left on the primary token, pausing %.0fs until reset", remaining, wait)
+            await asyncio.sleep(wait)
+        return token
+
+    def _record_rate(self, token: str, response: httpx.Response):
+        headers = response.headers
+        if "X-RateLimit-Remaining" in headers and "X-RateLimit-Reset" in headers:
+            self._rate[token] = (int(headers["X-RateLimit-Remaining"]), int(headers["X-RateLimit-Reset"]))
+
+    async def request(self, method: str, path: str, rotate: bool = False, **kwargs) -> httpx.Response:
+        """
+        Send a request with the primary token, or any pooled token for a rotate=True GET,
+        honoring GitHub's rate-limit headers:
+        - 429/403 secondary limits are retried (Retry-After, else jittered exponential backoff)
+        - tokens whose X-RateLimit-Remaining drops below the threshold are rested until X-RateLimit-Reset
+        - transient 502/503/504 on GET/HEAD are retried with a short exponential backoff
+        """
+        if method != "GET":
+            self._invalidate(path)
+        rate_attempt = server_attempt = 0
+        while True:
+            token = await self._next_token() if rotate and method == "GET" else await self._primary_token()
+            async with self._sem:
+                response = await self._http(token).request(method, path, **kwargs)
+            self._record_rate(token, response)
+            if (response.status_code in RETRY_STATUSES and method in RETRYABLE_METHODS
+                    and server_attempt < SERVER_RETRIES):
+                delay = SERVER_BACKOFF * 2 ** server_attempt
+                server_attempt += 1
+                log.warning(
+                    "⚠ GitHub returned %s, retrying in %.1fs (%s/%s)",
+                    response.status_code, delay, server_attempt, SERVER_RETRIES
+                )
+            elif _is_rate_limited(response):
+                if rate_attempt == MAX_RETRIES:
+                    raise GhRateLimited(response)
+                delay = self._retry_delay(response, rate_attempt)
+                rate_attempt += 1
+                log.warning(
+                    "⏳ GitHub rate limit hit (%s), retrying in %.1fs (%s/%s)",
+                    response.status_code, delay, rate_attempt, MAX_RETRIES
+                )
+            else:
+                return response
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _retry_delay(response: httpx.Response, attempt: int) -> float:
+        if "Retry-After" in response.headers:
+            return float(response.headers["Retry-After"])
+        if response.headers.get("X-RateLimit-Remaining") == "0" and "X-RateLimit-Reset" in response.headers:
+            return max(0, int(response.headers["X-RateLimit-Reset"]) - time.time())
+        return BACKOFF_BASE * 2 ** attempt * random.uniform(0.5, 1.5)
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        """
+        GET with request coalescing: concurrent identical GETs share one in-flight
+        request, and repo metadata / Pages responses are reused for CACHE_TTL seconds.
+        """
+        key = self._request_key(path, kwargs)
+        cacheable = _CACHEABLE_PATH.match(path) is not None
+        if cacheable:
+            hit = self._cache.get(key)
+            if hit and hit[0] > time.monotonic():
+                return hit[1]
+        if key in self._inflight:
+            return await self._inflight[key]
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark the exception as retrieved even if nobody else was waiting on it
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            response = await self.request("GET", path, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(response)
+        if cacheable:
+            self._cache[key] = (time.monotonic() + CACHE_TTL, response)
+        return response
+
+    @staticmethod
+    def _request_key(path: str, kwargs: dict):
+        params = kwargs.get("params") or {}
+        headers = kwargs.get("headers") or {}
+        return (path, repr(sorted(dict(params).items())), headers.get("If-None-Match"), kwargs.get("rotate", False))
+
+    def _invalidate(self, path: str):
+        """Drop cached GETs for the repo a write touches (or everything for non-repo writes)."""
+        prefix = "/".join(path.split("/")[:4]) if path.startswith("/repos/") else ""
+        # Exact repo path or a sub-path, so /repos/o/r doesn't evict /repos/o/r-2
+        for key in [k for k in self._cache if not prefix or k[0] == prefix or k[0].startswith(prefix + "/")]:
+            del self._cache[key]
+
+    async def post(self, path: str, json=None, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, json=json, **kwargs)
+
+    async def put(self, path: str, json=None, **kwargs) -> httpx.Response:
+        return await self.request("PUT", path, json=json, **kwargs)
+
+    async def patch(self, path: str, json=None, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", path, json=json, **kwargs)
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+class GraphQLError(Exception):
+    """Raised when a GraphQL response carries an `errors` list."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(err.get("message", str(err)) for err in errors))
+
+
+async def gh_graphql(query: str, variables: dict = None, client: GhClient = None):
+    """POST a GraphQL query/mutation through the shared client and return its `data`."""
+    client = client or get_client()
+    response = raise_for_status(await client.post("/graphql", json={"query": query, "variables": variables or {}}))
+    body = response.json()
+    if body.get("errors"):
+        raise GraphQLError(body["errors"])
+    return body["data"]
+
+
+_clients = {}
+_loop = None
+_lock = threading.Lock()
+
+
+def get_client(token: str = None) -> GhClient:
+    """Return the shared GhClient for a single token (defaults to the GITHUB_TOKENS pool)."""
+    tokens = (token,) if token else tuple(GITHUB_TOKENS)
+    with _lock:
+        if tokens not in _clients:
+            _clients[tokens] = GhClient(tokens)
+        return _clients[tokens]
+
+
+def _get_loop():
+    """
+    Start (once) the background event loop that owns every GitHub connection.
+    A fresh asyncio.run() per call would create a new loop each time and strand
+    the pooled connections of the previous one.
+    """
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="gh-client", daemon=True).start()
+        return _loop
+
+
+def run_sync(coro):
+    """Sync façade: run a coroutine on the GitHub loop and block until it's done."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def run_async(coro):
+    """Async bridge: run a coroutine on the GitHub loop and return a future awaitable from the caller's loop."""
+    return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _get_loop()))
@@ -0,0 +1,104 @@
+# src/gh_rest.py
+"""
+Thin async wrappers over the GitHub REST endpoints this app uses.
+Each function is a single request through the shared GhClient and returns the
+decoded JSON as a plain dict. Repositories are addressed by full name ("owner/repo").
+"""
+from urllib.parse import quote, urlparse, parse_qs
+import orjson
+from src.gh_client import get_client, raise_for_status
+
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def _json_with_base64(fields: dict, encoded: bytes) -> bytes:
+    """
+    Serialize `fields` plus a "content" member holding already base64-encoded bytes.
+    Base64 needs no JSON escaping, so it is spliced in as-is instead of being
+    decoded to str and re-encoded.
+    """
+    return orjson.dumps(fields)[:-1] + b',"content":"' + encoded + b'"}'
+
+
+async def get_user():
+    return raise_for_status(await get_client().get("/user")).json()
+
+
+async def get_repo(full_name: str):
+    return raise_for_status(await get_client().get(f"/repos/{full_name}", rotate=True)).json()
+
+
+async def create_repo(name: str, description: str = "", private: bool = False, auto_init: bool = True):
+    payload = {"name": name, "description": description, "private": private, "auto_init": auto_init}
+    return raise_for_status(await get_client().post("/user/repos", json=payload)).json()
+
+
+async def get_contents(full_name: str, path: str, ref: str = None):
+    params = {"ref": ref} if ref else None
+    response = await get_client().get(f"/repos/{full_name}/contents/{quote(path)}", params=params, rotate=True)
+    return raise_for_status(response).json()
+
+
+async def put_contents(full_name: str, path: str, message: str, encoded: bytes, sha: str = None, branch: str = None):
+    """Create (sha=None) or update a file via the Contents API; `encoded` is the base64 payload."""
+    fields = {"message": message}
+    if sha:
+        fields["sha"] = sha
+    if branch:
+        fields["branch"] = branch
+    response = await get_client().put(
+        f"/repos/{full_name}/contents/{quote(path)}",
+        content=_json_with_base64(fields, encoded),
+        headers=JSON_HEADERS
+    )
+    return raise_for_status(response).json()
+
+
+async def count_commits(full_name: str):
+    """Count commits with a single per_page=1 request, reading the page count from the Link header."""
+    response = raise_for_status(await get_client().get(f"/repos/{full_name}/commits", params={"per_page": 1}, rotate=True))
+    last = response.links.get("last", {}).get("url")
+    if last:
+        return int(parse_qs(urlparse(last).query)["page"][0])
+    return len(response.json())
+
+
+async def get_ref(full_name: str, ref: str):
+    return raise_for_status(await get_client().get(f"/repos/{full_name}/git/ref/{ref}", rotate=True)).json()
+
+
+async def get_git_commit(full_name: str, sha: str):
+    return raise_for_status(await get_client().get(f"/repos/{full_name}/git/commits/{sha}", rotate=True)).json()
+
+
+async def create_blob(full_name: str, content: str, encoding: str = "utf-8"):
+    payload = {"content": content, "encoding": encoding}
+    return raise_for_status(await get_client().post(f"/repos/{full_name}/git/blobs", json=payload)).json()
+
+
+async def create_blob_base64(full_name: str, encoded: bytes):
+    """Create a blob from already base64-encoded bytes without re-encoding them."""
+    response = await get_client().post(
+        f"/repos/{full_name}/git/blobs",
+        content=_json_with_base64({"encoding": "base64"}, encoded),
+        headers=JSON_HEADERS
+    )
+    return raise_for_status(response).json()
+
+
+async def create_tree(full_name: str, tree: list, base_tree: str = None):
+    payload = {"tree": tree}
+    if base_tree:
+        payload["base_tree"] = base_tree
+    return raise_for_status(await get_client().post(f"/repos/{full_name}/git/trees", json=payload)).json()
+
+
+async def create_commit(full_name: str, message: str, tree: str, parents: list):
+    payload = {"message": message, "tree": tree, "parents": parents}
+    return raise_for_status(await get_client().post(f"/repos/{full_name}/git/commits", json=payload)).json()
+
+
+async def update_ref(full_name: str, ref: str, sha: str):
+    response = await get_client().patch(f"/repos/{full_name}/git/refs/{ref}", json={"sha": sha})
+    return raise_for_status(response).json()
@@ -1,110 +1,283 @@
 # src/github_utility.py
 import os
 import base64
-import httpx
-import traceback
+import asyncio
+import logging
+import functools
+import random
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import quote
-from github import Github, GithubException
 from dotenv import load_dotenv
 from datetime import datetime
 import time
+import threading
+from cachetools import LRUCache, TTLCache
+from src import gh_rest
+from src.gh_client import get_client, gh_graphql, raise_for_status, run_sync, GhError, GhNotFound, GhRateLimited, GraphQLError
 
 
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 USERNAME = os.getenv("GITHUB_USERNAME")
-g = Github(GITHUB_TOKEN)
+log = logging.getLogger(__name__)
+
+MAX_DESCRIPTION_WORDS = 340
+LARGE_FILE_THRESHOLD = 10 * 1024 * 1024  # bytes; binaries above this skip the GraphQL commit
+PARALLEL_WRITE_WORKERS = 8  # GitHub tolerates ~8-10 concurrent authenticated writes
+WRITE_RETRIES = 4
+WRITE_BACKOFF = 0.5  # seconds
+BLOB_CACHE_SIZE = 256  # decoded text blobs kept for round-2 reads
+PAGES_CACHE_TTL = 60  # seconds to trust an is_pages_enabled answer
+REPO_HANDLE_TTL = 60  # seconds to reuse a fetched repo dict before re-checking it exists
 
 def get_authenticated_username():
-    """Get the username of the authenticated GitHub user."""
+    """Get the username of the authenticated GitHub user (looked up once per process)."""
     try:
-        user = g.get_user()
-        return user.login
+        return _authenticated_login()
     except Exception as e:
-        print(f"⚠ Could not get authenticated username: {e}")
+        log.warning("⚠ Could not get authenticated username: %s", e)
         return USERNAME  # Fallback to env variable
 
+
+@functools.lru_cache(maxsize=1)
+def _authenticated_login():
+    # Only successful lookups are cached; failures raise and are retried next call
+    login = run_sync(gh_rest.get_user())["login"]
+    log.info("🔑 Authenticated as GitHub user %s", login)
+    return login
+
+_repo_handles = TTLCache(maxsize=1024, ttl=REPO_HANDLE_TTL)  # {repo_name: repo dict}
+_repo_handles_lock = threading.Lock()
+_blob_cache = LRUCache(maxsize=BLOB_CACHE_SIZE)  # {blob sha: decoded text}; a blob's content never changes for its SHA
+_tree_cache = {}  # {full_name: (etag, {path: blob sha})} for the default branch's root tree
+_blob_lock = threading.Lock()  # guards both; written from worker threads and the GitHub loop
+_pages_cache = TTLCache(maxsize=1024, ttl=PAGES_CACHE_TTL)  # {repo_name: True} for repos with Pages on
+_pages_lock = threading.Lock()  # TTLCache isn't thread-safe; callers run on worker threads
+
+
+def get_repo_handle(repo_name: str):
+    """Return the repository dict for one of our repos, reused for REPO_HANDLE_TTL seconds. Raises GhNotFound."""
+    with _repo_handles_lock:
+        repo = _repo_handles.get(repo_name)
+    if repo is None:
+        repo = run_sync(gh_rest.get_repo(f"{get_authenticated_username()}/{repo_name}"))
+        _remember_repo_handle(repo_name, repo)
+    return repo
+
+
+def _remember_repo_handle(repo_name: str, repo: dict):
+    with _repo_handles_lock:
+        _repo_handles[repo_name] = repo
+
+
+def forget_repo_handle(repo):
+    """Drop a cached repo dict, e.g. after a 404 shows the repo was deleted."""
+    with _repo_handles_lock:
+        _repo_handles.pop(repo["full_name"].split("/", 1)[1], None)
+
+
 def create_repo(repo_name: str, description: str = ""):
-    """Create or fetch a public repository."""
-    user = g.get_user()
-    description = " ".join(description.split()[:340]) + ("..." if len(description.split()) > 340 else "")
+    """Create or fetch a public repository. Returns the repository as a dict."""
+    words = description.split()
+    description = " ".join(words[:MAX_DESCRIPTION_WORDS]) + ("..." if len(words) > MAX_DESCRIPTION_WORDS else "")
     
     try:
-        repo = user.get_repo(repo_name)
-        print("Repo already exists:", repo.full_name)
+        repo = get_repo_handle(repo_name)
+        log.debug("Repo already exists: %s", repo["full_name"])
         return repo
-    except GithubException as e:
-        if e.status != 404:
-            raise
-    repo = user.create_repo(
-        name=repo_name,
-        description=description,
-        private=False,
-        auto_init=True
-    )
-    print("Created repo:", repo.full_name)
+    except GhNotFound:
+        pass
+    repo = run_sync(gh_rest.create_repo(repo_name, description, private=False, auto_init=True))
+    log.info("Created repo: %s", repo["full_name"])
+    _remember_repo_handle(repo_name, repo)
     return repo
 
 
-def create_or_update_file(repo, path: str, content: str, message: str):
-    """Create a text file or update it if it exists."""
-    try:
-        current = repo.get_contents(path)
-        repo.update_file(path, message, content, current.sha)
-        print(f"Updated {path} in {repo.full_name}")
-    except GithubException as e:
-        if e.status == 404:
-            repo.create_file(path, message, content)
-            print(f"Created {path} in {repo.full_name}")
-        else:
-            raise
+def count_commits(repo):
+    """Return the number of commits on the default branch (one request, no pagination)."""
+    return run_sync(gh_rest.count_commits(repo["full_name"]))
 
 
-def create_or_update_binary_file(repo, path: str, binary_content: bytes, commit_message: str):
+def get_branch_sha(repo, branch: str = "main"):
+    """Return the commit SHA the branch currently points to."""
+    return run_sync(gh_rest.get_ref(repo["full_name"], f"heads/{branch}"))["object"]["sha"]
+
+
+def get_files_text(repo, paths):
     """
-    Safely create or update a binary file (e.g., image, zip).
-    GitHub API only supports base64-encoded strings, so encode manually.
+    Return {path: text} for several files on the default branch (None if missing).
+    Blobs already seen are served from _blob_cache by SHA; the rest come back in
+    one GraphQL round-trip, with REST as the fallback.
     """
-    encoded = base64.b64encode(binary_content).decode("utf-8")
+    return run_sync(_get_files_text_async(repo["full_name"], paths, repo.get("default_branch", "main")))
+
+
+async def _get_files_text_async(full_name: str, paths, branch: str):
+    try:
+        shas = await _root_blob_shas(full_name, branch)
+    except GhError as e:
+        log.warning("⚠ Could not list the tree of %s: %s", full_name, e)
+        shas = {}
+    with _blob_lock:
+        texts = {path: _blob_cache[shas[path]] for path in paths if shas.get(path) in _blob_cache}
+    missing = [path for path in paths if path not in texts]
+    if not missing:
+        return texts
     try:
-        current = repo.get_contents(path)
-        repo.update_file(path, commit_message, encoded, current.sha, branch="main", encoding="base64")
-        print(f"Updated binary file {path} in {repo.full_name}")
-    except GithubException as e:
-        if e.status == 404:
-            repo.create_file(path, commit_message, encoded, branch="main", encoding="base64")
-            print(f"Created binary file {path} in {repo.full_name}")
+        fetched = await _get_files_text_graphql(full_name, missing)
+    except (GraphQLError, GhError) as e:
+        log.warning("⚠ GraphQL file fetch failed (%s), falling back to REST", e)
+        fetched = await _get_files_text_rest(full_name, missing)
+    for path, blob in fetched.items():
+        if blob is None:
+            texts[path] = None
+        else:
+            _cache_blob(*blob)
+            texts[path] = blob[1]
+    return texts
+
+
+async def _root_blob_shas(full_name: str, branch: str):
+    """Return {path: blob sha} for the branch's top-level files; an unchanged tree costs a free 304."""
+    with _blob_lock:
+        cached = _tree_cache.get(full_name)
+    headers = {"Cache-Control": "max-age=0"}
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    response = await get_client().get(f"/repos/{full_name}/git/trees/{quote(branch)}", headers=headers)
+    if response.status_code == 304 and cached:
+        return cached[1]
+    shas = {entry["path"]: entry["sha"] for entry in raise_for_status(response).json()["tree"] if entry["type"] == "blob"}
+    if "ETag" in response.headers:
+        with _blob_lock:
+            _tree_cache[full_name] = (response.headers["ETag"], shas)
+    return shas
+
+
+def _git_blob_sha(data: bytes) -> str:
+    """The SHA GitHub assigns to a blob with these bytes."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _cache_blob(sha: str, text: str):
+    with _blob_lock:
+        _blob_cache[sha] = text
+
+
+def _remember_blobs(files_dict: dict):
+    """Seed _blob_cache with text files we just committed, so reading them back is free."""
+    for content in files_dict.values():
+        if isinstance(content, str):
+            _cache_blob(_git_blob_sha(content.encode("utf-8")), content)
+
+
+async def _get_files_text_graphql(full_name: str, paths):
+    """Return {path: (blob sha, text) or None} in a single query."""
+    owner, name = full_name.split("/", 1)
+    # One aliased `object(expression: "HEAD:<path>")` field per file
+    declarations = "".join(f", $e{i}: String!" for i in range(len(paths)))
+    fields = " ".join(f"f{i}: object(expression: $e{i}) {{ ... on Blob {{ oid text }} }}" for i in range(len(paths)))
+    query = f"query($owner: String!, $name: String!{declarations}) {{ repository(owner: $owner, name: $name) {{ {fields} }} }}"
+    variables = {"owner": owner, "name": name, **{f"e{i}": f"HEAD:{path}" for i, path in enumerate(paths)}}
+    repository = (await gh_graphql(query, variables))["repository"]
+    return {
+        path: (blob["oid"], blob["text"]) if (blob := repository[f"f{i}"]) else None
+        for i, path in enumerate(paths)
+    }
+
+
+async def _get_files_text_rest(full_name: str, paths):
+    results = await asyncio.gather(*[gh_rest.get_contents(full_name, path) for path in paths], return_exceptions=True)
+    blobs = {}
+    for path, result in zip(paths, results):
+        if isinstance(result, GhNotFound):
+            blobs[path] = None
+        elif isinstance(result, Exception):
+            raise result
         else:
-            print(f"Error updating binary file {path}: {e}")
-            raise
+            blobs[path] = (result["sha"], base64.b64decode(result["content"]).decode("utf-8", errors="ignore"))
+    return blobs
+
+
+async def _put_contents_async(full_name: str, path: str, encoded: bytes, message: str, branch: str = None):
+    """PUT a base64 payload through the Contents API. Returns True if the file already existed."""
+    try:
+        sha = (await gh_rest.get_contents(full_name, path, ref=branch))["sha"]
+    except GhNotFound:
+        sha = None
+    await gh_rest.put_contents(full_name, path, message, encoded, sha=sha, branch=branch)
+    return sha is not None
+
+
 def is_pages_enabled(repo_name: str):
     """
     Check if GitHub Pages is already enabled for a repository.
-    Returns True if enabled, False otherwise.
+    Returns True if enabled, False otherwise. Only True is cached (for PAGES_CACHE_TTL
+    seconds); Pages may turn on at any moment, so False is always re-checked live.
+    """
+    with _pages_lock:
+        if repo_name in _pages_cache:
+            return True
+    enabled = run_sync(is_pages_enabled_async(get_authenticated_username(), repo_name, quote(repo_name, safe='')))
+    if enabled:
+        _remember_pages(repo_name)
+    return enabled
+
+
+def _remember_pages(repo_name: str):
+    with _pages_lock:
+        _pages_cache[repo_name] = True
+
+
+# ETag cache for conditional GETs: {key: (etag, status_code)}
+_etag_cache = {}
+_etag_lock = asyncio.Lock()
+
+
+async def _conditional_get(path: str, key, **kwargs):
+    """
+    GET `path` with If-None-Match set from the previous response cached under `key`.
+    Returns the status code; a 304 means nothing changed, so the previously seen
+    status is returned instead. 304s don't count against the primary rate limit.
     """
-    username = get_authenticated_username()
+    async with _etag_lock:
+        cached = _etag_cache.get(key)
+    headers = {"Cache-Control": "max-age=0"}
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    response = await get_client().get(path, headers=headers, **kwargs)
+    if response.status_code == 304 and cached:
+        return cached[1]
+    etag = response.headers.get("ETag")
+    if etag:
+        async with _etag_lock:
+            _etag_cache[key] = (etag, response.status_code)
+    return response.status_code
+
+
+async def is_pages_enabled_async(username: str, repo_name: str, encoded_repo_name: str = None):
     # URL encode the repo name to handle spaces and special characters
-    encoded_repo_name = quote(repo_name, safe='')
-    headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
+    encoded_repo_name = encoded_repo_name or quote(repo_name, safe='')
     try:
-        response = httpx.get(
-            f"https://api.github.com/repos/{username}/{encoded_repo_name}/pages",
-            headers=headers,
-            timeout=30.0
-        )
-        return response.status_code == 200
+        status = await _conditional_get(f"/repos/{username}/{encoded_repo_name}/pages", (username, repo_name))
+        return status == 200
     except Exception as e:
-        print(f"❌ Exception while checking Pages status: {e}")
+        log.error("❌ Exception while checking Pages status: %s", e)
         return False
 def wait_for_pages(repo_name: str, timeout=120, interval=5):
+    return run_sync(wait_for_pages_async(get_authenticated_username(), repo_name, timeout, interval))
+
+
+async def wait_for_pages_async(username: str, repo_name: str, timeout=120, interval=5):
+    """Poll until Pages is enabled; sleeps on the event loop, so no thread is held while waiting."""
+    encoded_repo_name = quote(repo_name, safe='')
     start = time.time()
     while time.time() - start < timeout:
-        if is_pages_enabled(repo_name):
+        if await is_pages_enabled_async(username, repo_name, encoded_repo_name):
+            _remember_pages(repo_name)
             return True
-        time.sleep(interval)
+        await asyncio.sleep(interval)
     return False
 
 def enable_pages(repo_name: str, branch: str = "main", max_retries: int = 3):
@@ -112,57 +285,54 @@ def enable_pages(repo_name: str, branch: str = "main", max_retries: int = 3):
     Enable GitHub Pages for a repository with retry logic.
     Returns True if enabled successfully, False otherwise.
     """
-    username = get_authenticated_username()
+    enabled = run_sync(enable_pages_async(get_authenticated_username(), repo_name, branch, max_retries))
+    if enabled:
+        _remember_pages(repo_name)
+    return enabled
+
+
+async def enable_pages_async(username: str, repo_name: str, branch: str = "main", max_retries: int = 3):
+    client = get_client()
     # URL encode the repo name to handle spaces and special characters
     encoded_repo_name = quote(repo_name, safe='')
-    headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
     payload = {"source": {"branch": branch, "path": "/"}}
     
-    # First, verify the repository and branch exist
+    # First, verify the repository and branch exist (both checks in parallel)
     try:
-        repo_response = httpx.get(
-            f"https://api.github.com/repos/{username}/{encoded_repo_name}",
-            headers=headers,
-            timeout=10.0
-        )
-        print(f"🔍 Repository check for {username}/{repo_name} (encoded: {encoded_repo_name}): {repo_response.status_code}")
-        
-        branch_response = httpx.get(
-            f"https://api.github.com/repos/{username}/{encoded_repo_name}/branches/{branch}",
-            headers=headers,
-            timeout=10.0
+        repo_status, branch_status = await asyncio.gather(
+            _conditional_get(f"/repos/{username}/{encoded_repo_name}", (username, repo_name, "repo"), timeout=10.0),
+            _conditional_get(
+                f"/repos/{username}/{encoded_repo_name}/branches/{branch}",
+                (username, repo_name, "branch", branch),
+                timeout=10.0
+            )
         )
-        print(f"🔍 Branch '{branch}' check: {branch_response.status_code}")
+        log.debug("🔍 Repository check for %s/%s (encoded: %s): %s", username, repo_name, encoded_repo_name, repo_status)
+        log.debug("🔍 Branch '%s' check: %s", branch, branch_status)
     except Exception as e:
-        print(f"⚠ Pre-check failed: {e}")
+        log.warning("⚠ Pre-check failed: %s", e)
 
     for attempt in range(max_retries):
         try:
             # Small delay to ensure commits are fully processed by GitHub
             if attempt > 0:
                 wait_time = 2 ** attempt  # Exponential backoff: 2, 4, 8 seconds
-                print(f"⏳ Waiting {wait_time}s before retry {attempt + 1}/{max_retries}...")
-                time.sleep(wait_time)
+                log.info("⏳ Waiting %ss before retry %s/%s...", wait_time, attempt + 1, max_retries)
+                await asyncio.sleep(wait_time)
             
-            response = httpx.post(
-                f"https://api.github.com/repos/{username}/{encoded_repo_name}/pages",
-                headers=headers,
-                json=payload,
-                timeout=30.0
-            )
+            response = await client.post(f"/repos/{username}/{encoded_repo_name}/pages", json=payload)
             if response.status_code in (201, 202):  # 202 Accepted while GitHub builds pages
-                print(f"✅ GitHub Pages enabled for {repo_name}")
+                log.info("✅ GitHub Pages enabled for %s", repo_name)
                 return True
             elif response.status_code == 409:
                 # Pages already exists
-                print(f"✅ GitHub Pages already enabled for {repo_name}")
+                log.info("✅ GitHub Pages already enabled for %s", repo_name)
                 return True
             else:
-                error_msg = response.text
-                print(f"⚠ Failed to enable GitHub Pages (attempt {attempt + 1}/{max_retries}): {response.status_code} - {error_msg}")
+                log.warning(
+                    "⚠ Failed to enable GitHub Pages (attempt %s/%s): %s - %s",
+                    attempt + 1, max_retries, response.status_code, response.text
+                )
                 
                 # If it's a 404, the branch might not be ready yet, retry
                 if response.status_code == 404 and attempt < max_retries - 1:
@@ -170,7 +340,7 @@ def enable_pages(repo_name: str, branch: str = "main", max_retries: int = 3):
                 elif attempt == max_retries - 1:
                     return False
         except Exception as e:
-            print(f"❌ Exception while enabling GitHub Pages (attempt {attempt + 1}/{max_retries}): {e}")
+            log.error("❌ Exception while enabling GitHub Pages (attempt %s/%s): %s", attempt + 1, max_retries, e)
             if attempt == max_retries - 1:
                 return False
     
@@ -178,58 +348,158 @@ def enable_pages(repo_name: str, branch: str = "main", max_retries: int = 3):
 
 
 
+def create_or_update_files(repo, files: dict, commit_message: str = "Add/Update files"):
+    """
+    Create or update several files in a single commit.
+    This is the preferred write API; files: {path: str for text | bytes for binary}
+    If the single-commit paths fail, falls back to concurrent per-file writes.
+    Returns the commit SHA for a single commit, True if the per-file fallback
+    succeeded, False otherwise.
+    """
+    commit_sha = batch_update_files(repo, files, commit_message)
+    if commit_sha:
+        return commit_sha
+    log.warning("⚠ Single-commit write failed, writing %s files individually", len(files))
+    return _write_files_parallel(repo, files, commit_message)
+
+
+def _write_files_parallel(repo, files: dict, commit_message: str):
+    """One Contents API commit per file, PARALLEL_WRITE_WORKERS at a time. Returns True if all succeeded."""
+    failed = []
+    with ThreadPoolExecutor(max_workers=PARALLEL_WRITE_WORKERS) as executor:
+        futures = {
+            executor.submit(_write_file_with_retry, repo, path, content, f"{commit_message} ({path})"): path
+            for path, content in files.items()
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+                log.debug("Wrote %s in %s", futures[future], repo["full_name"])
+            except Exception as e:
+                log.error("❌ Writing %s failed: %s", futures[future], e)
+                failed.append(futures[future])
+    return not failed
+
+
+def _write_file_with_retry(repo, path: str, content, message: str):
+    encoded = base64.b64encode(_as_bytes(content))
+    for attempt in range(WRITE_RETRIES):
+        try:
+            return run_sync(_put_contents_async(repo["full_name"], path, encoded, message))
+        except GhError as e:
+            # Rate limits and 409s from concurrent commits racing on the branch are transient
+            retryable = isinstance(e, GhRateLimited) or e.status == 409
+            if not retryable or attempt == WRITE_RETRIES - 1:
+                raise
+            time.sleep(WRITE_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
 def batch_update_files(repo, files_dict: dict, commit_message: str):
     """
     Update multiple files in a single commit using GitHub's Tree API.
-    files_dict: {path: content_string}
+    files_dict: {path: str for text | bytes for binary}
+    Returns the new commit SHA, or False on failure.
     """
     try:
-        from github import InputGitTreeElement
-        
-        # Get the current commit
-        main_branch = repo.get_branch("main")
-        base_commit = repo.get_commit(main_branch.commit.sha)
-        base_tree = base_commit.commit.tree
-        
-        # Create blobs for each file
-        tree_elements = []
-        for path, content in files_dict.items():
-            # Create blob
-            blob = repo.create_git_blob(content, "utf-8")
-            # Create InputGitTreeElement object
-            element = InputGitTreeElement(
-                path=path,
-                mode="100644",  # file mode
-                type="blob",
-                sha=blob.sha
-            )
-            tree_elements.append(element)
-        
-        # Create new tree
-        new_tree = repo.create_git_tree(tree_elements, base_tree)
-        
-        # Create commit
-        new_commit = repo.create_git_commit(
-            commit_message,
-            new_tree,
-            [base_commit.commit]
-        )
-        
-        # Update branch reference
-        main_ref = repo.get_git_ref("heads/main")
-        main_ref.edit(new_commit.sha)
-        
-        print(f"✅ Batch updated {len(files_dict)} files in a single commit")
-        return True
+        if any(len(content) > LARGE_FILE_THRESHOLD for content in files_dict.values() if isinstance(content, bytes)):
+            # Too big to inline in a GraphQL mutation; blobs are uploaded one by one instead
+            commit_sha = run_sync(_batch_update_files_async(repo["full_name"], files_dict, commit_message))
+        else:
+            try:
+                commit_sha = run_sync(_commit_on_branch_async(repo["full_name"], files_dict, commit_message))
+            except GraphQLError as e:
+                log.warning("⚠ GraphQL commit failed (%s), falling back to the REST tree API", e)
+                commit_sha = run_sync(_batch_update_files_async(repo["full_name"], files_dict, commit_message))
+        log.debug("✅ Batch updated %s files in %s in a single commit", len(files_dict), repo["full_name"])
+        _remember_blobs(files_dict)
+        return commit_sha
     except Exception as e:
-        print(f"❌ Batch update failed: {e}")
-        traceback.print_exc()
+        if isinstance(e, GhNotFound):
+            forget_repo_handle(repo)
+        log.exception("❌ Batch update failed: %s", e)
         return False
 
 
+_CREATE_COMMIT_MUTATION = """
+mutation($input: CreateCommitOnBranchInput!) {
+  createCommitOnBranch(input: $input) { commit { oid } }
+}
+"""
+
+
+async def _commit_on_branch_async(full_name: str, files_dict: dict, commit_message: str, branch: str = "main"):
+    """Commit every file in a single createCommitOnBranch mutation."""
+    head = await gh_rest.get_ref(full_name, f"heads/{branch}")
+    variables = {
+        "input": {
+            "branch": {"repositoryNameWithOwner": full_name, "branchName": branch},
+            "message": {"headline": commit_message},
+            "expectedHeadOid": head["object"]["sha"],
+            "fileChanges": {
+                "additions": [
+                    {"path": path, "contents": base64.b64encode(_as_bytes(content)).decode("ascii")}
+                    for path, content in files_dict.items()
+                ]
+            }
+        }
+    }
+    data = await gh_graphql(_CREATE_COMMIT_MUTATION, variables)
+    return data["createCommitOnBranch"]["commit"]["oid"]
+
+
+async def _get_branch_head(full_name: str, branch: str):
+    """Return (commit_sha, tree_sha) of the branch head."""
+    ref = await gh_rest.get_ref(full_name, f"heads/{branch}")
+    commit_sha = ref["object"]["sha"]
+    commit = await gh_rest.get_git_commit(full_name, commit_sha)
+    return commit_sha, commit["tree"]["sha"]
+
+
+def _as_bytes(content) -> bytes:
+    return content if isinstance(content, bytes) else content.encode("utf-8")
+
+
+async def _create_blob(full_name: str, content):
+    """Text goes up as a utf-8 blob, binary as base64."""
+    if isinstance(content, bytes):
+        return await gh_rest.create_blob_base64(full_name, base64.b64encode(content))
+    return await gh_rest.create_blob(full_name, content)
+
+
+async def _batch_update_files_async(full_name: str, files_dict: dict, commit_message: str, branch: str = "main"):
+    paths = list(files_dict)
+
+    # Look up the branch head while all blobs are created in parallel
+    base, *blobs = await asyncio.gather(
+        _get_branch_head(full_name, branch),
+        *[_create_blob(full_name, files_dict[path]) for path in paths]
+    )
+    blob_shas = {path: blob["sha"] for path, blob in zip(paths, blobs)}
+    return await _commit_blobs_async(full_name, blob_shas, commit_message, base, branch)
+
+
+async def _commit_blobs_async(full_name: str, blob_shas: dict, commit_message: str, base, branch: str):
+    """Create a tree on top of `base` (commit_sha, tree_sha) from {path: blob_sha}, commit it and move the branch."""
+    base_sha, base_tree = base
+    tree = [
+        {"path": path, "mode": "100644", "type": "blob", "sha": sha}
+        for path, sha in blob_shas.items()
+    ]
+    new_tree = await gh_rest.create_tree(full_name, tree, base_tree)
+    new_commit = await gh_rest.create_commit(full_name, commit_message, new_tree["sha"], [base_sha])
+
+    # Update branch reference
+    await gh_rest.update_ref(full_name, f"heads/{branch}", new_commit["sha"])
+    return new_commit["sha"]
+
+
 def generate_mit_license(owner_name=None):
-    year = datetime.utcnow().year
-    owner = owner_name or USERNAME or "Owner"
+    # The year is part of the cache key, so a long-running process picks up the new year
+    return _mit_license_text(datetime.utcnow().year, owner_name or USERNAME or "Owner")
+
+
+@functools.lru_cache(maxsize=4)
+def _mit_license_text(year: int, owner: str):
     return f"""MIT License
 
 Copyright (c) {year} {owner}
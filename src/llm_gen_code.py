@@ -1,14 +1,24 @@
 # src/llm_gen_code.py
 import os
+import re
+import shutil
+import logging
+import tempfile
 import base64
-import requests
+import asyncio
+import aiofiles
+import httpx
+import orjson
+from blake3 import blake3
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from dotenv import load_dotenv
 from openai import OpenAI
 
 # Load environment variables
 load_dotenv()
+log = logging.getLogger(__name__)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAPI_BASE_URL = "https://aipipe.org/openai/v1"
@@ -16,11 +26,37 @@ OPENAPI_BASE_URL = "https://aipipe.org/openai/v1"
 try:
     client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 except Exception as e:
-    print(f"⚠️ Warning: Could not initialize OpenAI client: {e}")
+    log.warning("⚠️ Could not initialize OpenAI client: %s", e)
     client = None
 
+# Shared pooled client so repeated completions reuse the TLS connection to aipipe.org
+http_client = httpx.Client(
+    base_url=OPENAPI_BASE_URL,
+    http2=True,
+    timeout=httpx.Timeout(300.0, connect=10.0)
+)
+
 TMP_DIR = Path("/tmp/llm_attachments")
 TMP_DIR.mkdir(parents=True, exist_ok=True)
+DECODE_CHUNK_SIZE = 64 * 1024  # base64 chars per decode step, must be a multiple of 4
+PREVIEW_BYTES = 1000
+PREVIEW_WORKERS = 8
+
+# One scanner for both the separators the model uses between the app code and the
+# README, and (as a fallback) the first markdown heading that looks like a README
+_README_SCAN_RE = re.compile(
+    r"(?P<separator>---README\.md---|## README\.md|# README\.md|README\.md:|```markdown|---readme---|---README---)"
+    # Zero-width, so a separator on the same line is still found by the scan
+    r"|(?P<heading>^(?=[ \t]*#[^\n]*?(?i:readme|setup|overview)))",
+    re.MULTILINE
+)
+
+# Content-addressed cache of raw LLM responses; set LLM_CACHE_DISABLE=1 to bypass
+LLM_CACHE_DIR = Path("/tmp/llm_cache")
+LLM_CACHE_DISABLE = os.getenv("LLM_CACHE_DISABLE") == "1"
+# Partial output of in-flight completions, one directory per call
+LLM_STREAM_DIR = Path("/tmp/llm_stream")
+LLM_STREAM_KEEP = 20  # failed-stream directories kept for inspection; older ones are pruned
 
 
 def _call_openai_api(prompt: str, api_key: str) -> Optional[str]:
@@ -37,69 +73,233 @@ def _call_openai_api(prompt: str, api_key: str) -> Optional[str]:
                 {"role": "system", "content": "You are a coding assistant that writes complete applications."},
                 {"role": "user", "content": prompt}
             ],
-            "temperature": 0.2
+            "temperature": 0.2,
+            "stream": True
         }
 
-        response = requests.post(f"{OPENAPI_BASE_URL}/chat/completions", headers=headers, json=payload)
-        response.raise_for_status()
-
-        data = response.json()
-        return data["choices"][0]["message"]["content"]
+        chunks = []
+        writer = _StreamWriter(_prompt_key(prompt))
+        try:
+            with http_client.stream("POST", "/chat/completions", headers=headers, content=orjson.dumps(payload)) as response:
+                if response.is_error:
+                    response.read()  # so the error handler below can show the body
+                    response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line.startswith("data: ") or line == "data: [DONE]":
+                        continue
+                    choices = orjson.loads(line[6:]).get("choices") or [{}]
+                    content = (choices[0].get("delta") or {}).get("content")
+                    if content:
+                        chunks.append(content)
+                        writer.write(content)
+        except BaseException:
+            writer.close()  # keep the partial output around for inspection
+            raise
+        writer.discard()
+        return "".join(chunks)
 
     except Exception as e:
-        print(f"API call failed: {str(e)}")
-        # Print more detailed error info for debugging
+        log.error("API call failed: %s", e)
+        # Log more detailed error info for debugging
         if hasattr(e, 'response') and e.response is not None:
-            print(f"Response status: {e.response.status_code}")
-            print(f"Response content: {e.response.text[:500]}")
+            log.error("Response status: %s, content: %s", e.response.status_code, e.response.text[:500])
         return None
 
 
-def decode_attachments(attachments):
+def _prompt_key(prompt: str) -> str:
+    return blake3(prompt.encode("utf-8")).hexdigest()
+
+
+def _llm_cache_path(prompt: str) -> Path:
+    return LLM_CACHE_DIR / f"{_prompt_key(prompt)}.json"
+
+
+def _prune_stream_dirs():
+    """Delete all but the newest LLM_STREAM_KEEP mirror directories."""
+    dirs = []
+    for d in LLM_STREAM_DIR.iterdir():
+        try:
+            dirs.append((d.stat().st_mtime, d))
+        except OSError:
+            continue  # removed by a concurrent prune or discard
+    dirs.sort(reverse=True)
+    for _, old in dirs[LLM_STREAM_KEEP:]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+class _StreamWriter:
+    """
+    Mirror a streamed completion to disk as tokens arrive: text goes to index.html
+    until the README separator shows up, then to README.md. Lets partial output be
+    inspected long before the full response is in. Best-effort: any disk error just
+    turns the mirror off, it never fails the completion.
+    """
+
+    def __init__(self, key: str, separator: str = "---README.md---"):
+        self.directory = None
+        self._files = []
+        self._current = 0
+        self._separator = separator
+        self._pending = ""  # tail that may be the start of a separator split across chunks
+        try:
+            LLM_STREAM_DIR.mkdir(parents=True, exist_ok=True)
+            _prune_stream_dirs()
+            # Unique per call, so concurrent identical prompts don't share files
+            self.directory = Path(tempfile.mkdtemp(prefix=f"{key}.", dir=LLM_STREAM_DIR))
+            self._files = [
+                open(self.directory / "index.html", "w", encoding="utf-8"),
+                open(self.directory / "README.md", "w", encoding="utf-8")
+            ]
+        except OSError as e:
+            self._disable(e)
+
+    def _disable(self, error):
+        log.warning("⚠ LLM stream mirror disabled: %s", error)
+        for f in self._files:
+            try:
+                f.close()
+            except OSError:
+                pass
+        self._files = []
+
+    def write(self, text: str):
+        if not self._files:
+            return
+        try:
+            self._write(text)
+        except OSError as e:
+            self._disable(e)
+
+    def _write(self, text: str):
+        if self._current == 1:
+            self._files[1].write(text)
+            return
+        self._pending += text
+        idx = self._pending.find(self._separator)
+        if idx >= 0:
+            self._files[0].write(self._pending[:idx])
+            self._files[1].write(self._pending[idx + len(self._separator):])
+            self._current, self._pending = 1, ""
+        else:
+            keep = len(self._separator) - 1
+            if len(self._pending) > keep:
+                self._files[0].write(self._pending[:-keep])
+                self._pending = self._pending[-keep:]
+
+    def close(self):
+        if not self._files:
+            return
+        try:
+            self._files[self._current].write(self._pending)
+            for f in self._files:
+                f.close()
+        except OSError as e:
+            self._disable(e)
+        self._files = []
+
+    def discard(self):
+        """Close and delete the mirror once the full response is in hand."""
+        self.close()
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _load_cached_response(prompt: str) -> Optional[str]:
+    """Return the cached response text for this exact prompt, if any"""
+    try:
+        return orjson.loads(_llm_cache_path(prompt).read_bytes())["content"]
+    except (OSError, orjson.JSONDecodeError, KeyError, TypeError):
+        return None
+
+
+def _store_cached_response(prompt: str, text: str):
+    """Atomically write the response (tmp file + rename) so readers never see a partial entry"""
+    try:
+        LLM_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path = _llm_cache_path(prompt)
+        # Unique per call: worker threads of one process may store the same prompt at once
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(orjson.dumps({"content": text}))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError as e:
+        log.warning("⚠ Could not write LLM cache entry: %s", e)
+
+
+async def decode_attachments(attachments):
     """
     Decode base64 attachments from data URLs and save them to /tmp/llm_attachments
+    Attachments are decoded and written concurrently.
     Returns list of dicts: {"name", "path", "mime", "size"}
     """
+    attachments = attachments or []
+    results = await asyncio.gather(*[_save_attachment(att) for att in attachments], return_exceptions=True)
     saved = []
-    for att in attachments or []:
-        name = att.get("name", "attachment")
-        url = att.get("url", "")
-        if not url.startswith("data:"):
-            continue
-        try:
-            header, b64data = url.split(",", 1)
-            mime = header.split(";")[0].replace("data:", "")
-            data = base64.b64decode(b64data)
-            path = TMP_DIR / name
-            with open(path, "wb") as f:
-                f.write(data)
-            saved.append({"name": name, "path": str(path), "mime": mime, "size": len(data)})
-        except Exception as e:
-            print(f"⚠ Failed to decode attachment {name}: {e}")
+    for att, result in zip(attachments, results):
+        if isinstance(result, Exception):
+            log.warning("⚠ Failed to decode attachment %s: %s", att.get('name', 'attachment'), result)
+        elif result:
+            saved.append(result)
     return saved
 
 
+async def _save_attachment(att):
+    name = att.get("name", "attachment")
+    url = att.get("url", "")
+    if not url.startswith("data:"):
+        return None
+    header, b64data = url.split(",", 1)
+    mime = header.split(";")[0].replace("data:", "")
+    # MIME-wrapped base64 has a newline every 76 chars; fixed slices only line up without it
+    b64data = "".join(b64data.split())
+    path = TMP_DIR / name
+    size = 0
+    # Decode block by block so the full decoded payload is never held in memory
+    try:
+        async with aiofiles.open(path, "wb") as f:
+            for i in range(0, len(b64data), DECODE_CHUNK_SIZE):
+                data = await asyncio.to_thread(base64.b64decode, b64data[i:i + DECODE_CHUNK_SIZE])
+                await f.write(data)
+                size += len(data)
+    except Exception:
+        path.unlink(missing_ok=True)  # don't leave a truncated file behind
+        raise
+    return {"name": name, "path": str(path), "mime": mime, "size": size}
+
+
 def summarize_attachment_meta(saved):
     """
     Returns a human-readable summary for attachments.
     """
-    summaries = []
-    for s in saved:
-        nm, p, mime = s["name"], s["path"], s.get("mime", "")
-        try:
-            if mime.startswith("text") or nm.endswith((".md", ".txt", ".json", ".csv")):
-                with open(p, "r", encoding="utf-8", errors="ignore") as f:
-                    if nm.endswith(".csv"):
-                        lines = [next(f).strip() for _ in range(3)]
-                        preview = "\n".join(lines)
-                    else:
-                        preview = f.read(1000).replace("\n", " ")[:1000]
-                summaries.append(f"- {nm} ({mime}): preview: {preview}")
+    if not saved:
+        return ""
+    with ThreadPoolExecutor(max_workers=PREVIEW_WORKERS) as executor:
+        return "\n".join(executor.map(_summarize_one, saved))
+
+
+def _summarize_one(s):
+    nm, p, mime = s["name"], s["path"], s.get("mime", "")
+    try:
+        if mime.startswith("text") or nm.endswith((".md", ".txt", ".json", ".csv")):
+            # One fixed-size read per file, no text-mode codec or line iteration
+            fd = os.open(p, os.O_RDONLY)
+            try:
+                raw = os.read(fd, PREVIEW_BYTES)
+            finally:
+                os.close(fd)
+            preview = raw.decode("utf-8", "ignore")
+            if nm.endswith(".csv"):
+                preview = "\n".join(line.strip() for line in preview.split("\n")[:3])
             else:
-                summaries.append(f"- {nm} ({mime}): {s['size']} bytes")
-        except Exception as e:
-            summaries.append(f"- {nm} ({mime}): (could not read preview: {e})")
-    return "\n".join(summaries)
+                preview = preview.replace("\n", " ")
+            return f"- {nm} ({mime}): preview: {preview}"
+        return f"- {nm} ({mime}): {s['size']} bytes"
+    except Exception as e:
+        return f"- {nm} ({mime}): (could not read preview: {e})"
 
 
 def _strip_code_block(text: str) -> str:
@@ -149,7 +349,7 @@ def generate_app_code(brief, attachments=None, checks=None, round_num=1, prev_re
     round_num=2: revise based on previous code/README
     Returns: {"files": {"index.html": ..., "README.md": ...}, "attachments": [...]}
     """
-    saved = decode_attachments(attachments or [])
+    saved = asyncio.run(decode_attachments(attachments or []))
     attachments_meta = summarize_attachment_meta(saved)
 
     context_note = "" 
@@ -214,46 +414,47 @@ You are a professional web developer assistant.
         if not OPENAI_API_KEY:
             raise Exception("OpenAI API key not available")
 
-        text = _call_openai_api(user_prompt, OPENAI_API_KEY)
+        use_cache = round_num == 1 and not LLM_CACHE_DISABLE
+        text = _load_cached_response(user_prompt) if use_cache else None
         if text:
-            print("✅ Generated code using AIPipe-compatible API.")
-            
-            # Try multiple separators and formats
-            separators = ["---README.md---", "## README.md", "# README.md", "README.md:", "```markdown", "---readme---", "---README---"]
+            log.info("✅ Reusing cached LLM response for identical prompt.")
+        else:
+            text = _call_openai_api(user_prompt, OPENAI_API_KEY)
+            if text and use_cache:
+                _store_cached_response(user_prompt, text)
+        if text:
+            log.info("✅ Generated code using AIPipe-compatible API.")
             
             code_part = text
             readme_part = None
             
-            print(f"🔍 Searching for README in response (length: {len(text)})")
+            log.debug("🔍 Searching for README in response (length: %s)", len(text))
             
-            for separator in separators:
-                if separator in text:
-                    parts = text.split(separator, 1)
-                    if len(parts) == 2 and parts[1].strip():
-                        code_part = parts[0].strip()
-                        readme_part = parts[1].strip()
-                        print(f"✅ Found README using separator: {separator} (readme length: {len(readme_part)})")
-                        break
-                    else:
-                        print(f"⚠ Found separator {separator} but second part is empty")
+            # Single scan for any of the accepted separators, noting the first README-like heading
+            heading_start = None
+            for match in _README_SCAN_RE.finditer(text):
+                if match.lastgroup == "heading":
+                    if heading_start is None:
+                        heading_start = match.start()
+                    continue
+                remainder = text[match.end():].strip()
+                if remainder:
+                    code_part = text[:match.start()].strip()
+                    readme_part = remainder
+                    log.debug("✅ Found README using separator: %s (readme length: %s)", match.group(0), len(readme_part))
+                    break
+                else:
+                    log.debug("⚠ Found separator %s but second part is empty", match.group(0))
             
             # If no separator found, try to extract README from the end if it looks like markdown
-            if not readme_part:
-                lines = text.split('\n')
-                readme_start = -1
-                for i, line in enumerate(lines):
-                    if line.strip().startswith('#') and ('readme' in line.lower() or 'setup' in line.lower() or 'overview' in line.lower()):
-                        readme_start = i
-                        break
-                
-                if readme_start >= 0:
-                    code_part = '\n'.join(lines[:readme_start]).strip()
-                    readme_part = '\n'.join(lines[readme_start:]).strip()
-                    print("✅ Extracted README from markdown-like content")
+            if not readme_part and heading_start is not None:
+                code_part = text[:heading_start].strip()
+                readme_part = text[heading_start:].strip()
+                log.debug("✅ Extracted README from markdown-like content")
             
             # If still no README, generate one from LLM response context
             if not readme_part or len(readme_part.strip()) < 10:
-                print("⚠ No README found in LLM response, generating contextual README")
+                log.warning("⚠ No README found in LLM response, generating contextual README")
                 project_name = brief.split('.')[0].strip().title()
                 if not project_name or len(project_name) < 3:
                     project_name = "Generated Application"
@@ -292,7 +493,7 @@ This project was generated using AI assistance on iteration {round_num}.
             raise Exception("API returned empty response")
             
     except Exception as e:
-        print(f"⚠ OpenAI API failed, using fallback: {e}")
+        log.warning("⚠ OpenAI API failed, using fallback: %s", e)
         text = f"""
 <html>
   <head><title>Fallback App</title></head>
@@ -1,32 +1,48 @@
 # src/notification.py
+import asyncio
+import logging
 import httpx
+import orjson
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
-def notify_evaluation_server(evaluation_url: str, payload: dict) -> bool:
+log = logging.getLogger(__name__)
+
+NOTIFY_ATTEMPTS = 3
+NOTIFY_TIMEOUT = 5.0  # seconds per attempt
+
+_notify_client = httpx.AsyncClient(timeout=NOTIFY_TIMEOUT, limits=httpx.Limits(max_connections=32))
+
+
+async def notify_evaluation_server(evaluation_url: str, payload: dict) -> bool:
     """
     Send repo details back to the evaluation server.
-    Retries with exponential backoff if needed.
+    Retries with exponential backoff if needed; meant to be scheduled, not awaited inline.
     """
     headers = {"Content-Type": "application/json"}
+    content = orjson.dumps(payload)
 
     delay = 1  # start with 1 second
-    for attempt in range(5):  # try up to 5 times
+    for attempt in range(NOTIFY_ATTEMPTS):
         try:
-            r = httpx.post(evaluation_url, headers=headers, json=payload)
+            r = await _notify_client.post(evaluation_url, headers=headers, content=content)
             if r.status_code == 200:
-                print("✅ Evaluation server notified successfully.")
+                log.info("✅ Evaluation server notified successfully.")
                 return True
             else:
-                print(f"⚠️ Attempt {attempt+1}: Server responded {r.status_code} - {r.text}")
+                log.warning("⚠️ Attempt %s: Server responded %s - %s", attempt + 1, r.status_code, r.text)
         except Exception as e:
-            print(f"❌ Attempt {attempt+1} failed: {e}")
+            log.warning("❌ Attempt %s failed: %s", attempt + 1, e)
 
         # Exponential backoff
-        import time
-        time.sleep(delay)
-        delay *= 2
+        if attempt < NOTIFY_ATTEMPTS - 1:
+            await asyncio.sleep(delay)
+            delay *= 2
 
-    print("❌ Failed to notify evaluation server after retries.")
+    log.error("❌ Failed to notify evaluation server after retries.")
     return False
+
+
+async def aclose():
+    await _notify_client.aclose()